@@ -9,27 +9,22 @@ Instructions:
 import os
 import sys
 import re
+import heapq
+import math
+import shutil
+import struct
+import hashlib
+import json
+import tempfile
 import yaml
+from array import array
 from io import StringIO
+import numpy as np
 import pandas as pd
 
 import pyqt_files as pqt
 
 
-def parse_emails_from_file(filename, path=None, divider_char="\x0c"):
-    if path is not None:
-        filename = os.path.join(path, filename)
-
-    with open(filename) as f:
-        file_contents = f.read()
-
-    emails = file_contents.split(divider_char)
-
-    print("File contains {:d} emails".format(len(emails)))
-
-    return emails
-
-
 def inspect_email_text(text):
     """Extracts key information from email header in text.
 
@@ -127,60 +122,642 @@ def datetime_from_string(datestring, format=None):
     return dt
 
 
-def get_email_datetime(email_text):
-    """Extract datetime from raw email text for sorting.
+def get_email_header_fields(email_text):
+    """Extract the header fields of raw email text without the body.
 
     Args:
         email_text: Raw email text including headers
 
     Returns:
-        tuple: (datetime or None, error_message or None)
+        dict: Field names mapped to values for each 'Field: value' line
     """
-    # Quick parse to find Date field without full inspection
-    for line in email_text.split("\n"):
+    fields = {}
+    for line in StringIO(email_text):
         line = line.rstrip()
         if line == "":
             break
-        if line.startswith("Date: "):
-            date_str = line[6:]
-            try:
-                return datetime_from_string(date_str), None
-            except (ValueError, TypeError) as e:
-                return None, f"Could not parse date '{date_str}': {e}"
-    return None, "No Date field found"
+        field, sep, value = line.partition(": ")
+        if sep and field not in fields:
+            fields[field] = value
+    return fields
 
 
-def sort_emails_by_date(emails):
-    """Sort emails by datetime, with unparseable emails at the end.
+def get_email_datetime(email_text, fields=None):
+    """Extract datetime from raw email text for sorting.
 
     Args:
-        emails: List of raw email texts
+        email_text: Raw email text including headers
+        fields: Header fields from get_email_header_fields, if
+            already extracted
 
     Returns:
-        list: Emails sorted by datetime (oldest first), with
-              emails missing valid dates at the end
+        tuple: (datetime or None, error_message or None)
     """
-    dated_emails = []
-    undated_emails = []
+    if fields is None:
+        fields = get_email_header_fields(email_text)
+    if "Date" not in fields:
+        return None, "No Date field found"
+    date_str = fields["Date"]
+    try:
+        return datetime_from_string(date_str), None
+    except (ValueError, TypeError) as e:
+        return None, f"Could not parse date '{date_str}': {e}"
 
-    for email in emails:
-        dt, error = get_email_datetime(email)
-        if dt is not None:
-            dated_emails.append((dt, email))
+
+# Sort key used for emails without a valid date so that they
+# sort after every dated email (pandas timestamps end in 2262)
+UNDATED_TIMESTAMP = 2**63 - 1
+
+# Sort records spilled to disk:
+# (timestamp ns, byte offset, byte length, sender id, status flags)
+SORT_KEY_STRUCT = struct.Struct("<qqqiB")
+
+# Status flags stored in EmailTable.flags
+FLAG_INVALID = 1
+FLAG_PROCESSED = 2
+FLAG_SKIPPED = 4
+
+# Header fields inspect_email_text needs (it defaults the Subject)
+REQUIRED_FIELDS = ("From", "Date")
+
+
+def iter_email_spans(
+    filename, path=None, divider_char="\x0c", encoding="utf-8", chunk_size=1 << 20
+):
+    """Find the position of each email in an export file without loading it.
+
+    Scans the file in chunks for the divider and yields one span per
+    email, in the same order and number as str.split(divider_char).
+
+    Args:
+        filename: Export file containing emails separated by divider_char
+        path: Optional directory prepended to filename
+        divider_char: Character separating emails in the file
+        encoding: Encoding of the file
+        chunk_size: Number of bytes read from the file at a time
+
+    Yields:
+        tuple: (offset, length) of each email in bytes
+    """
+    if path is not None:
+        filename = os.path.join(path, filename)
+
+    divider = divider_char.encode(encoding)
+    n_keep = len(divider) - 1
+    span_start = 0
+    pos = 0
+    tail = b""
+    with open(filename, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            # Keep the end of the previous chunk in case a divider
+            # is split across two chunks
+            data = tail + chunk
+            base = pos - len(tail)
+            i = data.find(divider)
+            while i != -1:
+                if base + i >= span_start:
+                    yield span_start, base + i - span_start
+                    span_start = base + i + len(divider)
+                i = data.find(divider, i + 1)
+            pos += len(chunk)
+            tail = data[-n_keep:] if n_keep > 0 else b""
+
+    yield span_start, pos - span_start
+
+
+def read_email_span(f, offset, length, encoding="utf-8"):
+    """Read the text of one email from an export file opened in binary mode.
+
+    Line endings are normalized in the same way as reading the file
+    in text mode.
+    """
+    f.seek(offset)
+    text = f.read(length).decode(encoding)
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def _write_sort_run(keys):
+    """Sort a run of keys and spill it to a temporary file."""
+    keys.sort()
+    run = tempfile.TemporaryFile()
+    for key in keys:
+        run.write(SORT_KEY_STRUCT.pack(*key))
+    run.seek(0)
+    return run
+
+
+def _iter_sort_run(run, records_per_read=4096):
+    """Read back the sorted keys from a spilled run."""
+    size = SORT_KEY_STRUCT.size
+    while True:
+        data = run.read(size * records_per_read)
+        if not data:
+            break
+        yield from SORT_KEY_STRUCT.iter_unpack(data)
+
+
+def sort_email_spans_by_date(
+    filename,
+    path=None,
+    divider_char="\x0c",
+    encoding="utf-8",
+    run_size=100000,
+    sender_ids=None,
+):
+    """Sort emails in an export file by datetime using an external merge sort.
+
+    Only fixed-size records are sorted.  They are collected in runs of
+    run_size records, each run is sorted and spilled to a temporary
+    file, and the runs are then merged.  Email text is read one email
+    at a time to find its date, sender and status and is not kept in
+    memory.
+
+    Emails are ordered oldest first, with emails missing valid dates at
+    the end in their original order.
+
+    Args:
+        filename: Export file containing emails separated by divider_char
+        path: Optional directory prepended to filename
+        divider_char: Character separating emails in the file
+        encoding: Encoding of the file
+        run_size: Maximum number of records held in memory at once
+        sender_ids: Dict mapping sender email addresses to ids, updated
+            in place with any new senders
+
+    Yields:
+        tuple: (timestamp, offset, length, sender_id, flags) for each
+            email where timestamp is in nanoseconds or UNDATED_TIMESTAMP
+    """
+    if path is not None:
+        filename = os.path.join(path, filename)
+
+    if sender_ids is None:
+        sender_ids = {}
+
+    runs = []
+    keys = []
+    n_emails = 0
+    n_undated = 0
+    try:
+        with open(filename, "rb") as f:
+            for offset, length in iter_email_spans(
+                filename, divider_char=divider_char, encoding=encoding
+            ):
+                n_emails += 1
+                email = read_email_span(f, offset, length, encoding=encoding)
+                fields = get_email_header_fields(email)
+                dt, error = get_email_datetime(email, fields=fields)
+                # Dates that clean to an empty string parse as NaT
+                if dt is not None and not pd.isna(dt):
+                    timestamp = dt.value
+                else:
+                    if error is None:
+                        error = f"Could not parse date '{fields['Date']}'"
+                    print(f"Warning: {error}")
+                    timestamp = UNDATED_TIMESTAMP
+                    n_undated += 1
+                sender = find_email(fields.get("From", ""))
+                sender_id = sender_ids.setdefault(sender, len(sender_ids))
+                flags = 0
+                if not all(k in fields for k in REQUIRED_FIELDS):
+                    flags |= FLAG_INVALID
+                # Offset breaks ties so equal dates keep their file order
+                keys.append((timestamp, offset, length, sender_id, flags))
+                if len(keys) >= run_size:
+                    runs.append(_write_sort_run(keys))
+                    keys = []
+
+        print("File contains {:d} emails".format(n_emails))
+        if n_undated:
+            print(
+                f"Note: {n_undated} email(s) without valid dates placed at end"
+            )
+
+        if not runs:
+            keys.sort()
+            yield from keys
         else:
-            print(f"Warning: {error}")
-            undated_emails.append(email)
+            if keys:
+                runs.append(_write_sort_run(keys))
+                keys = []
+            yield from heapq.merge(*(_iter_sort_run(run) for run in runs))
+    finally:
+        for run in runs:
+            run.close()
 
-    # Sort by datetime (oldest first)
-    dated_emails.sort(key=lambda x: x[0])
 
-    # Return sorted emails, with undated ones at the end
-    sorted_emails = [email for dt, email in dated_emails] + undated_emails
+class EmailTable:
+    """Compact columnar table of the emails in an export file.
 
-    if undated_emails:
-        print(f"Note: {len(undated_emails)} email(s) without valid dates placed at end")
+    Each email is a row of fixed-size columns: byte offset and length
+    in the export file, int64 timestamp, interned sender id and status
+    flags.  Email text is not stored and is read from the file on demand.
 
-    return sorted_emails
+    Build with EmailTable.from_file(), which orders the rows oldest
+    first using sort_email_spans_by_date.  Call close() when done.
+    """
+
+    __slots__ = (
+        "filename",
+        "divider_char",
+        "encoding",
+        "offsets",
+        "lengths",
+        "timestamps",
+        "senders",
+        "flags",
+        "sender_emails",
+        "_sender_ids",
+        "_file",
+    )
+
+    def __init__(self, filename, divider_char="\x0c", encoding="utf-8"):
+        self.filename = filename
+        self.divider_char = divider_char
+        self.encoding = encoding
+        self.offsets = np.zeros(0, dtype=np.int64)
+        self.lengths = np.zeros(0, dtype=np.int64)
+        self.timestamps = np.zeros(0, dtype=np.int64)
+        self.senders = np.zeros(0, dtype=np.int32)
+        self.flags = np.zeros(0, dtype=np.uint8)
+        self.sender_emails = []
+        self._sender_ids = {}
+        self._file = None
+
+    @classmethod
+    def from_file(
+        cls,
+        filename,
+        path=None,
+        divider_char="\x0c",
+        encoding="utf-8",
+        run_size=100000,
+    ):
+        """Build the table for an export file, sorted by date."""
+        if path is not None:
+            filename = os.path.join(path, filename)
+
+        table = cls(filename, divider_char=divider_char, encoding=encoding)
+        offsets = array("q")
+        lengths = array("q")
+        timestamps = array("q")
+        senders = array("i")
+        flags = array("B")
+
+        for timestamp, offset, length, sender_id, status in (
+            sort_email_spans_by_date(
+                filename,
+                divider_char=divider_char,
+                encoding=encoding,
+                run_size=run_size,
+                sender_ids=table._sender_ids,
+            )
+        ):
+            offsets.append(offset)
+            lengths.append(length)
+            timestamps.append(timestamp)
+            senders.append(sender_id)
+            flags.append(status)
+
+        table.sender_emails = list(table._sender_ids)
+        table.offsets = np.frombuffer(offsets, dtype=np.int64).copy()
+        table.lengths = np.frombuffer(lengths, dtype=np.int64).copy()
+        table.timestamps = np.frombuffer(timestamps, dtype=np.int64).copy()
+        table.senders = np.frombuffer(senders, dtype=np.int32).copy()
+        table.flags = np.frombuffer(flags, dtype=np.uint8).copy()
+
+        return table
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def sender(self, i):
+        """Return the sender email address of row i."""
+        return self.sender_emails[self.senders[i]]
+
+    def read_email(self, i):
+        """Read the text of row i from the export file."""
+        if self._file is None:
+            self._file = open(self.filename, "rb")
+        return read_email_span(
+            self._file, self.offsets[i], self.lengths[i], encoding=self.encoding
+        )
+
+    def close(self):
+        """Close the export file if it is open for reading."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def has_flag(self, flag):
+        """Return a boolean mask of the rows with flag set."""
+        return (self.flags & flag) != 0
+
+    def mark_processed(self, indices):
+        self.flags[indices] |= FLAG_PROCESSED
+
+    def mark_skipped(self, indices):
+        self.flags[indices] |= FLAG_SKIPPED
+
+    def mark_offsets(self, offsets, flag):
+        """Set flag on the rows at the given byte offsets."""
+        self.flags[np.isin(self.offsets, offsets)] |= flag
+
+    def pending(self):
+        """Return the indices of the rows not yet processed."""
+        return np.flatnonzero(~self.has_flag(FLAG_PROCESSED))
+
+    def save_pending(self):
+        """Rewrite the export file with only the unprocessed emails.
+
+        The raw bytes of each pending email are copied in table order
+        to a temporary file which then replaces the export file, and
+        the offsets of the pending rows are updated to match it.  If no
+        emails are pending the export file is deleted.
+        """
+        pending = self.pending()
+        self.close()
+        if len(pending) == 0:
+            print("No emails to save")
+            if os.path.isfile(self.filename):
+                os.remove(self.filename)
+            print("File deleted")
+        else:
+            divider = self.divider_char.encode(self.encoding)
+            new_offsets = np.zeros(len(pending), dtype=np.int64)
+            fd, temp_filename = tempfile.mkstemp(
+                dir=os.path.dirname(os.path.abspath(self.filename))
+            )
+            try:
+                with open(self.filename, "rb") as f, os.fdopen(fd, "wb") as out:
+                    for j, i in enumerate(pending):
+                        if j > 0:
+                            out.write(divider)
+                        new_offsets[j] = out.tell()
+                        f.seek(self.offsets[i])
+                        out.write(f.read(self.lengths[i]))
+                shutil.copymode(self.filename, temp_filename)
+                os.replace(temp_filename, self.filename)
+            except BaseException:
+                os.remove(temp_filename)
+                raise
+            processed = self.has_flag(FLAG_PROCESSED)
+            self.offsets[processed] = -1
+            self.lengths[processed] = 0
+            self.offsets[pending] = new_offsets
+
+        print("{:d} emails saved back to file".format(len(pending)))
+
+
+def get_email_fingerprint(email_text):
+    """Compute a fingerprint identifying an email across exports.
+
+    Uses the Message-ID header if present.  Otherwise hashes the sender
+    address, date, subject and body with whitespace normalized, so that
+    the same message exported twice gets the same fingerprint.
+
+    Args:
+        email_text: Raw email text including headers
+
+    Returns:
+        bytes: 16-byte fingerprint
+    """
+    fields = get_email_header_fields(email_text)
+    fields = {k.lower(): v for k, v in fields.items()}
+    h = hashlib.blake2b(digest_size=16)
+    message_id = fields.get("message-id", "").strip().strip("<>").lower()
+    if message_id:
+        h.update(b"message-id\x00" + message_id.encode())
+    else:
+        body = email_text.partition("\n\n")[2]
+        parts = [
+            find_email(fields.get("from", "")),
+            " ".join(fields.get("date", "").split()),
+            " ".join(fields.get("subject", "").split()),
+            " ".join(body.split()),
+        ]
+        h.update("\x00".join(parts).encode())
+    return h.digest()
+
+
+class BloomFilter:
+    """Bloom filter over 16-byte fingerprints.
+
+    Answers 'definitely not present' or 'maybe present'.  Bit positions
+    are derived from the fingerprint itself by double hashing.
+    """
+
+    __slots__ = ("capacity", "n_bits", "n_hashes", "bits")
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = capacity
+        self.n_bits = max(
+            8, int(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.n_hashes = max(1, round(self.n_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.n_bits + 7) // 8)
+
+    def _positions(self, fingerprint):
+        h1 = int.from_bytes(fingerprint[:8], "little")
+        h2 = int.from_bytes(fingerprint[8:16], "little") | 1
+        return ((h1 + k * h2) % self.n_bits for k in range(self.n_hashes))
+
+    def add(self, fingerprint):
+        for pos in self._positions(fingerprint):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, fingerprint):
+        return all(
+            self.bits[pos >> 3] & (1 << (pos & 7))
+            for pos in self._positions(fingerprint)
+        )
+
+
+class FingerprintStore:
+    """Append-only store of the fingerprints of archived emails.
+
+    Fingerprints are kept as 16-byte records in filename.  A Bloom
+    filter built when the store is opened answers most lookups for new
+    emails without loading the fingerprints themselves; the exact set
+    is only loaded the first time the filter reports a possible match.
+    """
+
+    __slots__ = ("filename", "count", "_bloom", "_fingerprints")
+
+    RECORD_SIZE = 16
+
+    def __init__(self, filename="archived_fingerprints.bin", capacity=100000):
+        self.filename = filename
+        self.count = 0
+        self._fingerprints = None
+        if os.path.isfile(filename):
+            size = os.path.getsize(filename)
+            self.count = size // self.RECORD_SIZE
+            if size % self.RECORD_SIZE:
+                # Drop a partial record left by an interrupted write
+                with open(filename, "r+b") as f:
+                    f.truncate(self.count * self.RECORD_SIZE)
+        self._build_bloom(max(capacity, 2 * self.count))
+
+    def _iter_file(self):
+        if not os.path.isfile(self.filename):
+            return
+        with open(self.filename, "rb") as f:
+            for _ in range(self.count):
+                yield f.read(self.RECORD_SIZE)
+
+    def _build_bloom(self, capacity):
+        self._bloom = BloomFilter(capacity)
+        for fingerprint in self._iter_file():
+            self._bloom.add(fingerprint)
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, fingerprint):
+        if fingerprint not in self._bloom:
+            return False
+        if self._fingerprints is None:
+            self._fingerprints = set(self._iter_file())
+        return fingerprint in self._fingerprints
+
+    def add(self, fingerprint):
+        """Record the fingerprint of an archived email."""
+        if fingerprint in self:
+            return
+        with open(self.filename, "ab") as f:
+            f.write(fingerprint)
+        self.count += 1
+        if self._fingerprints is not None:
+            self._fingerprints.add(fingerprint)
+        if self.count > self._bloom.capacity:
+            self._build_bloom(2 * self.count)
+        else:
+            self._bloom.add(fingerprint)
+
+
+class SessionJournal:
+    """Append-only journal of the decisions made while processing an export.
+
+    Each decision is one JSON line: a sender added to the address
+    database, an email saved or removed, or an email skipped.  Emails
+    are identified by their byte offset in the export file, so the
+    journal starts with the size and modification time of the export
+    and is only replayed while the export is unchanged.
+
+    Every record is flushed when appended but fsync is only called
+    every sync_every records and at checkpoints.
+    """
+
+    __slots__ = ("filename", "sync_every", "_file", "_unsynced")
+
+    def __init__(self, filename, sync_every=8):
+        self.filename = filename
+        self.sync_every = sync_every
+        self._file = None
+        self._unsynced = 0
+
+    @staticmethod
+    def _export_state(export_file):
+        stat = os.stat(export_file)
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    def _read_records(self):
+        """Read the journal, stopping at a torn or corrupt last line."""
+        records = []
+        good_size = 0
+        try:
+            with open(self.filename, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        break
+                    good_size += len(line)
+        except FileNotFoundError:
+            pass
+        return records, good_size
+
+    def open(self, export_file):
+        """Open the journal for export_file and return earlier decisions.
+
+        If the export has changed since the journal was started, only
+        the sender records are kept, since they do not refer to byte
+        offsets in the export.
+
+        Returns:
+            list: Records of the previous session on this export
+        """
+        header = {"op": "start", **self._export_state(export_file)}
+        records, good_size = self._read_records()
+        if records and records[0] == header:
+            self._file = open(self.filename, "r+b")
+            self._file.truncate(good_size)
+            self._file.seek(good_size)
+            return records[1:]
+
+        records = [r for r in records[1:] if r.get("op") == "sender"]
+        if records:
+            print("Export file has changed. Keeping journalled senders only.")
+
+        # Start the new journal in a temporary file so that the old
+        # one is not lost if this is interrupted
+        temp_filename = self.filename + ".tmp"
+        self._file = open(temp_filename, "wb")
+        for record in [header] + records:
+            self.append(record)
+        self.sync()
+        os.replace(temp_filename, self.filename)
+        return records
+
+    def append(self, record):
+        """Append one decision to the journal."""
+        self._file.write(json.dumps(record).encode() + b"\n")
+        self._file.flush()
+        self._unsynced += 1
+        if self._unsynced >= self.sync_every:
+            self.sync()
+
+    def sync(self):
+        """Make all appended decisions durable."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def remove(self):
+        """Close and delete the journal once its decisions are saved."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if os.path.isfile(self.filename):
+            os.remove(self.filename)
+
+
+def replay_journal(records, table, email_db):
+    """Apply the decisions of an interrupted session.
+
+    Args:
+        records: Journal records returned by SessionJournal.open
+        table: EmailTable of the export file
+        email_db: Address database, updated in place
+    """
+    for record in records:
+        if record["op"] == "sender":
+            email_db[record["email"]] = record["entry"]
+
+    table.mark_offsets(
+        [r["offset"] for r in records if r["op"] in ("saved", "removed")],
+        FLAG_PROCESSED,
+    )
+    table.mark_offsets(
+        [r["offset"] for r in records if r["op"] == "skipped"], FLAG_SKIPPED
+    )
+    print(f"Resumed previous session: {len(records)} decision(s) replayed")
 
 
 def get_email_date_string(data, format="%Y %m %d"):
@@ -282,9 +859,13 @@ def load_email_db(filename="email_db.yaml"):
 
 
 def save_email_db(email_db, filename="email_db.yaml"):
-    """Save address database."""
+    """Save address database.
 
-    with open(filename, "w") as f:
+    Written to a temporary file first so that an interrupted save
+    does not leave a truncated database.
+    """
+    temp_filename = filename + ".tmp"
+    with open(temp_filename, "w") as f:
         yaml.dump(
             email_db,
             f,
@@ -292,27 +873,11 @@ def save_email_db(email_db, filename="email_db.yaml"):
             allow_unicode=True,
             sort_keys=False,
         )
+    os.replace(temp_filename, filename)
 
     print("Address database saved to file '{}'.".format(filename))
 
 
-def save_emails_to_file(emails, filename, path=None, divider_char="\x0c"):
-    if path is not None:
-        filename = os.path.join(path, filename)
-
-    if len(emails) == 0:
-        print("No emails to save")
-        if os.path.isfile(filename):
-            os.remove(filename)
-        print("File deleted")
-    else:
-        file_contents = divider_char.join(emails)
-        with open(filename, "w") as f:
-            f.write(file_contents)
-
-    print("{:d} emails saved back to file".format(len(emails)))
-
-
 def save_email_to_text_file(filepath, name, date_string, email_content):
     """Save an email to a text file, handling filename conflicts.
 
@@ -450,6 +1015,7 @@ def main():
     """Main entry point for the email archiver application."""
     # Load email database if it exists
     email_db = load_email_db()
+    fingerprints = FingerprintStore()
 
     app = pqt.QApplication(sys.argv)
     app.setStyle("macos")
@@ -463,13 +1029,30 @@ def main():
         print("No file selected. Exiting.")
         sys.exit(0)
 
-    emails = parse_emails_from_file(input_file)
-    emails = sort_emails_by_date(emails)
+    table = EmailTable.from_file(input_file)
     print(f"Emails sorted by date (oldest first)")
-    emails_processed = []
+
+    # Continue an interrupted session from where it stopped
+    journal = SessionJournal(input_file + ".journal")
+    records = journal.open(input_file)
+    if records:
+        replay_journal(records, table, email_db)
 
     batch = 0
-    for email in emails:
+    for i in range(len(table)):
+        if table.flags[i] & (FLAG_PROCESSED | FLAG_SKIPPED):
+            continue
+        offset = int(table.offsets[i])
+
+        # Skip emails archived in a previous run before doing any work
+        email = table.read_email(i)
+        fingerprint = get_email_fingerprint(email)
+        if fingerprint in fingerprints:
+            print("Skipping email that is already archived")
+            table.mark_processed(i)
+            journal.append({"op": "removed", "offset": offset})
+            continue
+
         if batch == 0:
             n = None
             print("Enter number of emails you want to process or 0 to quit.")
@@ -482,14 +1065,16 @@ def main():
                 break
             batch = n
 
+        # Prints the missing fields and a preview of invalid emails
         data = inspect_email_text(email)
-        if data is None:
+        if table.flags[i] & FLAG_INVALID:
             print("Skipping email with missing required fields")
-            emails_processed.append(email)  # Mark as processed to remove it
+            table.mark_processed(i)  # Mark as processed to remove it
+            journal.append({"op": "removed", "offset": offset})
             batch = batch - 1
             continue
 
-        from_email = find_email(data["From"])
+        from_email = table.sender(i)
         print("\nProcessing email from", from_email)
 
         window.show_message("Email from: " + data["From"])
@@ -525,6 +1110,13 @@ def main():
                     "path": path,
                     "Last used": date_string,
                 }
+                journal.append(
+                    {
+                        "op": "sender",
+                        "email": from_email,
+                        "entry": email_db[from_email],
+                    }
+                )
 
             elif r == "q":
                 break
@@ -539,24 +1131,26 @@ def main():
             )
             print(result)
 
-            emails_processed.append(email)
+            fingerprints.add(fingerprint)
+            table.mark_processed(i)
+            journal.append({"op": "saved", "offset": offset, "path": filepath})
             batch = batch - 1
 
             if batch == 0:
-                # Do a save of results
+                # Checkpoint: make this batch's decisions durable.  The
+                # export is only rewritten when the session ends.
+                journal.sync()
                 save_email_db(email_db)
-                emails = [
-                    email for email in emails if email not in emails_processed
-                ]
-                save_emails_to_file(emails, input_file)
 
         else:
             print("Email was not added")
+            table.mark_skipped(i)
+            journal.append({"op": "skipped", "offset": offset})
 
+    journal.sync()
     save_email_db(email_db)
-
-    emails = [email for email in emails if email not in emails_processed]
-    save_emails_to_file(emails, input_file)
+    table.save_pending()
+    journal.remove()
 
     window.show()
     print("Close window to exit.")
@@ -0,0 +1,85 @@
+import os
+import stat
+
+import numpy as np
+
+import mailarchiver as ma
+
+
+def write_export(tmp_path, emails):
+    filename = tmp_path / "export.txt"
+    with open(filename, "w", encoding="utf-8", newline="") as f:
+        f.write("\x0c".join(emails))
+    return filename
+
+
+EMAILS = [
+    "From: B <b@example.com>\r\nDate: 2010-03-01\r\nSubject: 1\r\n\r\nbody 1\r\n",
+    "From: A <A@example.com>\nDate: 2010-01-01\nSubject: 2\n\nbody 2 é\n",
+    "From: b@example.com\nSubject: 3\n\nno date\n",
+    "Date: 2010-02-01\nSubject: 4\n\nno sender\n",
+    "From: a@example.com\nDate: 2010-01-01\n\nno subject\n",
+]
+
+
+def test_from_file_sorts_and_fills_columns(tmp_path):
+    table = ma.EmailTable.from_file(write_export(tmp_path, EMAILS))
+    try:
+        texts = [table.read_email(i) for i in range(len(table))]
+        expected_order = [1, 4, 3, 0, 2]
+        assert texts == [EMAILS[k].replace("\r\n", "\n") for k in expected_order]
+        assert [table.sender(i) for i in range(len(table))] == [
+            "a@example.com",
+            "a@example.com",
+            "",
+            "b@example.com",
+            "b@example.com",
+        ]
+        assert list(table.has_flag(ma.FLAG_INVALID)) == [
+            False,
+            False,
+            True,
+            False,
+            True,
+        ]
+    finally:
+        table.close()
+
+
+def test_save_pending_keeps_pending_bytes(tmp_path):
+    filename = write_export(tmp_path, EMAILS)
+    raw = filename.read_bytes()
+    table = ma.EmailTable.from_file(filename)
+    pending_bytes = [
+        raw[table.offsets[i] : table.offsets[i] + table.lengths[i]] for i in (1, 3)
+    ]
+    table.mark_processed(np.array([0, 2, 4]))
+
+    table.save_pending()
+
+    assert filename.read_bytes() == b"\x0c".join(pending_bytes)
+    assert list(table.pending()) == [1, 3]
+    assert table.read_email(3) == EMAILS[0].replace("\r\n", "\n")
+    table.close()
+
+
+def test_save_pending_keeps_file_mode(tmp_path):
+    filename = write_export(tmp_path, EMAILS)
+    os.chmod(filename, 0o644)
+    table = ma.EmailTable.from_file(filename)
+    table.mark_processed(0)
+
+    table.save_pending()
+    table.close()
+
+    assert stat.S_IMODE(os.stat(filename).st_mode) == 0o644
+
+
+def test_save_pending_deletes_file_when_all_processed(tmp_path):
+    filename = write_export(tmp_path, EMAILS)
+    table = ma.EmailTable.from_file(filename)
+    table.mark_processed(np.arange(len(table)))
+
+    table.save_pending()
+
+    assert not filename.exists()
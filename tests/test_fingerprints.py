@@ -0,0 +1,51 @@
+import mailarchiver as ma
+
+
+def make_fingerprints(n, start=0):
+    return [
+        ma.get_email_fingerprint(
+            f"From: p{i}@example.com\nDate: 2010-01-01\nSubject: s\n\nbody {i}\n"
+        )
+        for i in range(start, start + n)
+    ]
+
+
+def test_fingerprint_ignores_formatting_differences():
+    a = "From: Ann <Ann@Example.com>\nDate: 1 Jan 2010\nSubject: Hi\n\nLine\r\n  one\n"
+    b = "From: ann@example.com\nDate: 1 Jan  2010\nSubject: Hi\n\nLine one"
+    c = "From: ann@example.com\nDate: 1 Jan 2010\nSubject: Hi\n\nLine two"
+    assert ma.get_email_fingerprint(a) == ma.get_email_fingerprint(b)
+    assert ma.get_email_fingerprint(a) != ma.get_email_fingerprint(c)
+
+
+def test_fingerprint_uses_message_id():
+    a = "Message-ID: <ABC@host>\nFrom: a@example.com\n\nbody a"
+    b = "Message-Id: abc@host\nFrom: b@example.com\n\nbody b"
+    assert ma.get_email_fingerprint(a) == ma.get_email_fingerprint(b)
+
+
+def test_store_reopens_and_rebuilds_bloom_filter(tmp_path):
+    filename = str(tmp_path / "fingerprints.bin")
+    added = make_fingerprints(50)
+    others = make_fingerprints(50, start=50)
+
+    # Small capacity forces the Bloom filter to be rebuilt while adding
+    store = ma.FingerprintStore(filename, capacity=10)
+    for fingerprint in added:
+        store.add(fingerprint)
+    store.add(added[0])
+    assert len(store) == 50
+    assert store._bloom.capacity >= 50
+    assert all(f in store for f in added)
+    assert not any(f in store for f in others)
+
+    # Drop a partial record as if a write had been interrupted
+    with open(filename, "ab") as f:
+        f.write(b"partial")
+
+    store = ma.FingerprintStore(filename, capacity=10)
+    assert len(store) == 50
+    assert (tmp_path / "fingerprints.bin").stat().st_size == 50 * 16
+    assert all(f in store._bloom for f in added)
+    assert all(f in store for f in added)
+    assert not any(f in store for f in others)
@@ -0,0 +1,75 @@
+import os
+
+import mailarchiver as ma
+
+SENDER = {
+    "op": "sender",
+    "email": "a@example.com",
+    "entry": {"name": "A", "path": "/tmp/A", "Last used": "2010 01 01"},
+}
+
+
+def write_export(tmp_path):
+    filename = tmp_path / "export.txt"
+    filename.write_text(
+        "\x0c".join(
+            f"From: {sender}@example.com\nDate: 2010-01-0{i + 1}\n"
+            f"Subject: {i}\n\nbody {i}\n"
+            for i, sender in enumerate(["a", "b", "a", "c"])
+        )
+    )
+    return str(filename)
+
+
+def test_journal_replays_and_ignores_torn_line(tmp_path):
+    export_file = write_export(tmp_path)
+    table = ma.EmailTable.from_file(export_file)
+    journal_file = export_file + ".journal"
+
+    journal = ma.SessionJournal(journal_file, sync_every=2)
+    assert journal.open(export_file) == []
+    journal.append(SENDER)
+    journal.append({"op": "saved", "offset": int(table.offsets[0]), "path": "/a"})
+    journal.append({"op": "removed", "offset": int(table.offsets[1])})
+    journal.append({"op": "skipped", "offset": int(table.offsets[3])})
+    # Simulate a crash in the middle of writing a record
+    journal._file.write(b'{"op": "sav')
+    journal._file.close()
+
+    journal = ma.SessionJournal(journal_file)
+    records = journal.open(export_file)
+    assert [r["op"] for r in records] == ["sender", "saved", "removed", "skipped"]
+
+    email_db = {}
+    ma.replay_journal(records, table, email_db)
+    assert email_db == {"a@example.com": SENDER["entry"]}
+    assert list(table.pending()) == [2, 3]
+    assert list(table.has_flag(ma.FLAG_SKIPPED)) == [False, False, False, True]
+
+    # The torn line is dropped so new records follow the last good one
+    journal.append({"op": "removed", "offset": int(table.offsets[2])})
+    journal.sync()
+    journal.remove()
+    assert not os.path.exists(journal_file)
+
+
+def test_journal_keeps_senders_when_export_changes(tmp_path):
+    export_file = write_export(tmp_path)
+    journal_file = export_file + ".journal"
+
+    journal = ma.SessionJournal(journal_file)
+    journal.open(export_file)
+    journal.append(SENDER)
+    journal.append({"op": "saved", "offset": 0, "path": "/a"})
+    journal.sync()
+    journal._file.close()
+
+    with open(export_file, "a") as f:
+        f.write("\x0cFrom: d@example.com\nDate: 2010-02-01\n\nnew\n")
+
+    records = ma.SessionJournal(journal_file).open(export_file)
+    assert records == [SENDER]
+
+    # The kept senders survive another restart on the changed export
+    records = ma.SessionJournal(journal_file).open(export_file)
+    assert records == [SENDER]
@@ -0,0 +1,95 @@
+import random
+
+import pytest
+
+import mailarchiver as ma
+
+
+def write_export(tmp_path, emails, divider_char="\x0c"):
+    filename = tmp_path / "export.txt"
+    with open(filename, "w", encoding="utf-8", newline="") as f:
+        f.write(divider_char.join(emails))
+    return filename
+
+
+def make_emails(n, seed=0):
+    rng = random.Random(seed)
+    emails = []
+    for i in range(n):
+        header = f"From: Person {i % 7} <p{i % 7}@example.com>\r\n"
+        if rng.random() > 0.1:
+            # Few distinct dates so that there are many ties
+            header += f"Date: 2010-0{rng.randint(1, 3)}-1{rng.randint(0, 2)}\n"
+        header += "Subject: Test\n"
+        emails.append(header + f"\nBody of email {i} é\r\nSecond line\n")
+    return emails
+
+
+def reference_sort(emails):
+    """Stable in-memory sort, oldest first with undated emails last."""
+    dated, undated = [], []
+    for email in emails:
+        dt, _ = ma.get_email_datetime(email)
+        if dt is None:
+            undated.append(email)
+        else:
+            dated.append((dt, email))
+    dated.sort(key=lambda x: x[0])
+    return [email for _, email in dated] + undated
+
+
+@pytest.mark.parametrize("divider_char", ["\x0c", "é", "--", "\r\n\r\n"])
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 64])
+def test_iter_email_spans_matches_split(tmp_path, divider_char, chunk_size):
+    text = "".join(
+        ["", "a", "bc\r\n", "", "déf", "--x", "\r\n", ""][i % 8] + divider_char
+        for i in range(20)
+    )
+    text += "tail\r\n"
+    filename = write_export(tmp_path, [text])
+    raw = filename.read_bytes()
+
+    spans = list(
+        ma.iter_email_spans(filename, divider_char=divider_char, chunk_size=chunk_size)
+    )
+
+    pieces = [raw[offset : offset + length].decode() for offset, length in spans]
+    assert pieces == text.split(divider_char)
+
+
+def test_iter_email_spans_empty_file(tmp_path):
+    filename = write_export(tmp_path, [""])
+    assert list(ma.iter_email_spans(filename)) == [(0, 0)]
+
+
+@pytest.mark.parametrize("run_size", [1, 7, 100000])
+def test_sort_email_spans_by_date_matches_in_memory_sort(tmp_path, run_size):
+    emails = make_emails(200)
+    filename = write_export(tmp_path, emails)
+    # Reading in text mode normalizes the CRLF line endings
+    with open(filename, encoding="utf-8") as f:
+        expected = reference_sort(f.read().split("\x0c"))
+
+    with open(filename, "rb") as f:
+        result = [
+            ma.read_email_span(f, span[1], span[2])
+            for span in ma.sort_email_spans_by_date(filename, run_size=run_size)
+        ]
+
+    assert result == expected
+
+
+def test_sort_email_spans_by_date_puts_nat_dates_last(tmp_path):
+    emails = [
+        "From: a@example.com\nDate: 2010-01-02\n\nfirst dated\n",
+        "From: b@example.com\nDate: PST\n\ndate parses as NaT\n",
+        "From: c@example.com\nDate: 2010-01-01\n\nsecond dated\n",
+    ]
+    filename = write_export(tmp_path, emails)
+
+    spans = list(ma.sort_email_spans_by_date(filename))
+
+    with open(filename, "rb") as f:
+        result = [ma.read_email_span(f, span[1], span[2]) for span in spans]
+    assert result == [emails[2], emails[0], emails[1]]
+    assert spans[-1][0] == ma.UNDATED_TIMESTAMP